@@ -11,6 +11,7 @@
     Optional, Sequence, Type, Union, cast
 )
 
+from kitty.key_encoding import CTRL
 from kitty.types import DecoratedFunc, ParsedShortcut
 from kitty.typing import (
     AbstractEventLoop, BossType, Debug, ImageManagerType, KeyActionType,
@@ -23,6 +24,9 @@
 if TYPE_CHECKING:
     from kitty.file_transmission import FileTransmissionCommand
 
+ctrl_c_shortcut = ParsedShortcut(CTRL, 'c')
+ctrl_d_shortcut = ParsedShortcut(CTRL, 'd')
+
 
 class ButtonEvent(NamedTuple):
     mouse_event: MouseEvent
@@ -129,10 +133,10 @@ def on_key_event(self, key_event: KeyEventType, in_bracketed_paste: bool = False
 
     def perform_default_key_action(self, key_event: KeyEventType) -> bool:
         ' Override in sub-class if you want to handle these key events yourself '
-        if key_event.matches('ctrl+c'):
+        if key_event.matches(ctrl_c_shortcut):
             self.on_interrupt()
             return True
-        if key_event.matches('ctrl+d'):
+        if key_event.matches(ctrl_d_shortcut):
             self.on_eot()
             return True
         return False
@@ -2,10 +2,8 @@
 # License: GPL v3 Copyright: 2018, Kovid Goyal <kovid at kovidgoyal.net>
 
 import asyncio
-import codecs
 import io
 import os
-import re
 import selectors
 import signal
 import sys
@@ -13,12 +11,14 @@
 from contextlib import contextmanager, suppress
 from enum import Enum, IntFlag, auto
 from functools import partial
-from typing import Any, Callable, Dict, Generator, List, NamedTuple, Optional
+from typing import (
+    Any, Callable, Dict, Generator, NamedTuple, Optional, Union
+)
 
 from kitty.constants import is_macos
 from kitty.fast_data_types import (
     FILE_TRANSFER_CODE, close_tty, normal_tty, open_tty,
-    parse_input_from_terminal, raw_tty
+    parse_input_from_terminal, parse_sgr_mouse_event, raw_tty
 )
 from kitty.key_encoding import (
     ALT, CTRL, SHIFT, backspace_key, decode_key_event, enter_key
@@ -31,6 +31,13 @@
 from .handler import Handler
 from .operations import MouseTracking, init_state, reset_state
 
+try:
+    import orjson
+    json_loads: Callable[[str], Any] = orjson.loads
+except ImportError:
+    import json
+    json_loads = json.loads
+
 
 class BinaryWrite(Protocol):
 
@@ -44,14 +51,20 @@ def flush(self) -> None:
 def debug_write(*a: Any, **kw: Any) -> None:
     from base64 import standard_b64encode
     fobj = kw.pop('file', sys.stderr.buffer)
-    buf = io.StringIO()
-    kw['file'] = buf
-    print(*a, **kw)
-    stext = buf.getvalue()
-    for i in range(0, len(stext), 256):
-        chunk = stext[i:i + 256]
-        text = b'\x1bP@kitty-print|' + standard_b64encode(chunk.encode('utf-8')) + b'\x1b\\'
-        fobj.write(text)
+    sep, end = kw.get('sep'), kw.get('end')
+    stext = (' ' if sep is None else sep).join(map(str, a)) + ('\n' if end is None else end)
+    data = stext.encode('utf-8')
+    mv = memoryview(data)
+    chunks = []
+    pos = 0
+    while pos < len(data):
+        chunk_end = pos + 1024
+        # each chunk is decoded separately, so do not split multi-byte characters
+        while chunk_end < len(data) and data[chunk_end] & 0xc0 == 0x80:
+            chunk_end -= 1
+        chunks.append(b'\x1bP@kitty-print|' + standard_b64encode(mv[pos:chunk_end]) + b'\x1b\\')
+        pos = chunk_end
+    fobj.write(b''.join(chunks))
     fobj.flush()
 
 
@@ -144,10 +157,8 @@ def pixel_to_cell(px: int, length: int, cell_length: int) -> int:
 
 
 def decode_sgr_mouse(text: str, screen_size: ScreenSize) -> MouseEvent:
-    cb_, x_, y_ = text.split(';')
-    m, y_ = y_[-1], y_[:-1]
-    cb, x, y = map(int, (cb_, x_, y_))
-    typ = EventType.RELEASE if m == 'm' else (EventType.MOVE if cb & MOTION_INDICATOR else EventType.PRESS)
+    cb, x, y, is_release = parse_sgr_mouse_event(text)
+    typ = EventType.RELEASE if is_release else (EventType.MOVE if cb & MOTION_INDICATOR else EventType.PRESS)
     buttons: MouseButton = MouseButton.NONE
     cb3 = cb & 3
     if cb >= 128:
@@ -213,11 +224,20 @@ def __enter__(self) -> None:
         self.asyncio_loop.add_signal_handler(signal.SIGHUP, self.on_hup)
 
     def __exit__(self, *a: Any) -> None:
-        tuple(map(self.asyncio_loop.remove_signal_handler, (
-            signal.SIGWINCH, signal.SIGINT, signal.SIGTERM, signal.SIGHUP)))
+        self.asyncio_loop.remove_signal_handler(signal.SIGWINCH)
+        self.asyncio_loop.remove_signal_handler(signal.SIGINT)
+        self.asyncio_loop.remove_signal_handler(signal.SIGTERM)
+        self.asyncio_loop.remove_signal_handler(signal.SIGHUP)
 
 
-sanitize_bracketed_paste: str = '[\x03\x04\x0e\x0f\r\x07\x7f\x8d\x8e\x8f\x90\x9b\x9d\x9e\x9f]'
+special_text_actions: Dict[str, Callable[[Handler], None]] = {
+    '\r': lambda h: h.on_key(enter_key),
+    '\177': lambda h: h.on_key(backspace_key),
+    '\x03': lambda h: h.on_interrupt(),
+    '\x04': lambda h: h.on_eot(),
+}
+special_text_chars = ''.join(special_text_actions)
+sanitize_bracketed_paste: str = '\x03\x04\x0e\x0f\r\x07\x7f\x8d\x8e\x8f\x90\x9b\x9d\x9e\x9f'
 
 
 class Loop:
@@ -229,81 +249,99 @@ def __init__(
     ):
         if is_macos:
             # On macOS PTY devices are not supported by the KqueueSelector and
-            # the PollSelector is broken, causes 100% CPU usage
+            # the PollSelector is broken, causes 100% CPU usage, as poll()
+            # reports POLLNVAL for tty devices. Since we only ever watch the
+            # single tty fd, the O(nfds) cost of select() is negligible.
             self.asyncio_loop: asyncio.AbstractEventLoop = asyncio.SelectorEventLoop(selectors.SelectSelector())
             asyncio.set_event_loop(self.asyncio_loop)
         else:
-            self.asyncio_loop = asyncio.get_event_loop()
+            try:
+                import uvloop
+            except ImportError:
+                self.asyncio_loop = asyncio.get_event_loop()
+            else:
+                # libuv polls the tty via epoll directly from C, avoiding the
+                # python level selector dispatch for every read/write callback
+                self.asyncio_loop = uvloop.new_event_loop()
+                asyncio.set_event_loop(self.asyncio_loop)
         self.return_code = 0
         self.overlay_ready_reported = False
         self.optional_actions = optional_actions
-        self.read_buf = ''
-        self.decoder = codecs.getincrementaldecoder('utf-8')('ignore')
-        try:
-            self.iov_limit = max(os.sysconf('SC_IOV_MAX') - 1, 255)
-        except Exception:
-            self.iov_limit = 255
+        self.read_buf = b''
+        self.read_view = memoryview(bytearray(io.DEFAULT_BUFFER_SIZE))
+        self.parse_input_from_terminal: Callable[[Union[bytes, memoryview], bool], bytes]
         self.parse_input_from_terminal = partial(parse_input_from_terminal, self._on_text, self._on_dcs, self._on_csi, self._on_osc, self._on_pm, self._on_apc)
-        self.ebs_pat = re.compile('([\177\r\x03\x04])')
         self.in_bracketed_paste = False
-        self.sanitize_bracketed_paste = bool(sanitize_bracketed_paste)
-        if self.sanitize_bracketed_paste:
-            self.sanitize_ibp_pat = re.compile(sanitize_bracketed_paste)
+        self.sanitize_bracketed_paste = sanitize_bracketed_paste
+        # created on first use as most kittens never receive pastes
+        self.sanitize_ibp_table: Optional[Dict[int, Optional[int]]] = None
 
     def _read_ready(self, handler: Handler, fd: int) -> None:
         try:
-            bdata = os.read(fd, io.DEFAULT_BUFFER_SIZE)
+            n = os.readv(fd, (self.read_view,))
         except BlockingIOError:
             return
-        if not bdata:
+        if not n:
             handler.terminal_io_ended = True
             self.quit(1)
             return
-        data = self.decoder.decode(bdata)
+        # the parser returns any unconsumed input as a copy, so read_view
+        # can be safely re-used for the next read
+        bdata: Union[bytes, memoryview] = self.read_view[:n]
         if self.read_buf:
-            data = self.read_buf + data
-        self.read_buf = data
+            bdata = self.read_buf + bdata
         self.handler = handler
         try:
-            self.read_buf = self.parse_input_from_terminal(self.read_buf, self.in_bracketed_paste)
+            self.read_buf = self.parse_input_from_terminal(bdata, self.in_bracketed_paste)
         except Exception:
-            self.read_buf = ''
+            self.read_buf = b''
             raise
         finally:
             del self.handler
 
     # terminal input callbacks {{{
     def _on_text(self, text: str) -> None:
-        if self.in_bracketed_paste and self.sanitize_bracketed_paste:
-            text = self.sanitize_ibp_pat.sub('', text)
-
-        for chunk in self.ebs_pat.split(text):
-            if len(chunk) == 1:
-                if chunk == '\r':
-                    self.handler.on_key(enter_key)
-                elif chunk == '\177':
-                    self.handler.on_key(backspace_key)
-                elif chunk == '\x03':
-                    self.handler.on_interrupt()
-                elif chunk == '\x04':
-                    self.handler.on_eot()
-                else:
-                    self.handler.on_text(chunk, self.in_bracketed_paste)
-            elif chunk:
-                self.handler.on_text(chunk, self.in_bracketed_paste)
+        if len(text) == 1 and not self.in_bracketed_paste:
+            # fast path for interactive typing
+            action = special_text_actions.get(text)
+            if action is None:
+                self.handler.on_text(text, False)
+            else:
+                action(self.handler)
+            return
+        if self.in_bracketed_paste and self.sanitize_ibp_table is not None:
+            text = text.translate(self.sanitize_ibp_table)
+
+        limit = len(text)
+        # position of the next occurrence of each special char in text, limit
+        # when it does not occur
+        nexts = [text.find(ch) % (limit + 1) for ch in special_text_chars]
+        start = 0
+        while start < limit:
+            end = min(nexts)
+            if end > start:
+                self.handler.on_text(text[start:end], self.in_bracketed_paste)
+            if end >= limit:
+                break
+            ch = text[end]
+            start = end + 1
+            i = special_text_chars.index(ch)
+            nexts[i] = text.find(ch, start) % (limit + 1)
+            special_text_actions[ch](self.handler)
 
     def _on_dcs(self, dcs: str) -> None:
         if dcs.startswith('@kitty-cmd'):
-            import json
-            self.handler.on_kitty_cmd_response(json.loads(dcs[len('@kitty-cmd'):]))
+            self.handler.on_kitty_cmd_response(json_loads(dcs[len('@kitty-cmd'):]))
         elif dcs.startswith('1+r'):
-            from binascii import unhexlify
-            vals = dcs[3:].split(';')
-            for q in vals:
-                parts = q.split('=', 1)
+            rest = dcs[3:]
+            while rest:
+                q, _, rest = rest.partition(';')
+                name, sep, hexval = q.partition('=')
+                if not sep:
+                    continue
                 try:
-                    name, val = parts[0], unhexlify(parts[1]).decode('utf-8', 'replace')
-                except Exception:
+                    val = bytes.fromhex(hexval).decode('utf-8', 'replace')
+                except ValueError:
                     continue
                 self.handler.on_capability_response(name, val)
 
@@ -321,6 +359,8 @@ def _on_csi(self, csi: str) -> None:
         elif q in 'u~ABCDEHFPQRS':
             if csi == '200~':
                 self.in_bracketed_paste = True
+                if self.sanitize_bracketed_paste and self.sanitize_ibp_table is None:
+                    self.sanitize_ibp_table = str.maketrans('', '', self.sanitize_bracketed_paste)
                 return
             elif csi == '201~':
                 self.in_bracketed_paste = False
@@ -365,41 +405,23 @@ def _on_apc(self, apc: str) -> None:
 
     @property
     def total_pending_bytes_to_write(self) -> int:
-        return sum(map(len, self.write_buf))
+        return len(self.write_buf)
 
     def _write_ready(self, handler: Handler, fd: int) -> None:
-        if len(self.write_buf) > self.iov_limit:
-            self.write_buf[self.iov_limit - 1] = b''.join(self.write_buf[self.iov_limit - 1:])
-            del self.write_buf[self.iov_limit:]
-        total_size = self.total_pending_bytes_to_write
-        if total_size:
+        if self.write_buf:
             try:
-                written = os.writev(fd, self.write_buf)
+                written = os.write(fd, self.write_buf)
             except BlockingIOError:
                 return
             if not written:
                 handler.terminal_io_ended = True
                 self.quit(1)
                 return
-        else:
-            written = 0
-        if written >= total_size:
-            self.write_buf: List[bytes] = []
+            del self.write_buf[:written]
+        if not self.write_buf:
             self.asyncio_loop.remove_writer(fd)
             self.waiting_for_writes = False
             handler.on_writing_finished()
-        else:
-            consumed = 0
-            for i, buf in enumerate(self.write_buf):
-                if not written:
-                    break
-                if len(buf) <= written:
-                    written -= len(buf)
-                    consumed += 1
-                    continue
-                self.write_buf[i] = buf[written:]
-                break
-            del self.write_buf[:consumed]
 
     def quit(self, return_code: Optional[int] = None) -> None:
         if return_code is not None:
@@ -407,13 +429,13 @@ def quit(self, return_code: Optional[int] = None) -> None:
         self.asyncio_loop.stop()
 
     def loop_impl(self, handler: Handler, term_manager: TermManager, image_manager: Optional[ImageManagerType] = None) -> Optional[str]:
-        self.write_buf = []
+        self.write_buf = bytearray()
         tty_fd = term_manager.tty_fd
         tb = None
         self.waiting_for_writes = True
 
         def schedule_write(data: bytes) -> None:
-            self.write_buf.append(data)
+            self.write_buf.extend(data)
             if not self.waiting_for_writes:
                 self.asyncio_loop.add_writer(tty_fd, self._write_ready, handler, tty_fd)
                 self.waiting_for_writes = True
@@ -425,7 +447,7 @@ def handle_exception(loop: asyncio.AbstractEventLoop, context: Dict[str, Any]) -
             exc = context.get('exception')
             if exc is not None:
                 import traceback
-                tb += '\n' + ''.join(traceback.format_exception(exc.__class__, exc, exc.__traceback__))
+                tb += '\n' + ''.join(traceback.TracebackException.from_exception(exc).format())
 
         self.asyncio_loop.set_exception_handler(handle_exception)
         handler._initialize(self._get_screen_size(), term_manager, schedule_write, self, debug, image_manager)
@@ -462,7 +484,7 @@ def _on_sigwinch() -> None:
                 import traceback
                 tb = traceback.format_exc()
 
-            term_manager.extra_finalize = b''.join(self.write_buf).decode('utf-8')
+            term_manager.extra_finalize = self.write_buf.decode('utf-8')
             if tb is not None:
                 report_overlay_ready = handler.overlay_ready_report_needed and not self.overlay_ready_reported
                 self.return_code = 1
@@ -2,7 +2,7 @@ import termios
 from ctypes import Array, c_ubyte
 from typing import (
     Any, Callable, Dict, List, NewType, Optional, Tuple, TypedDict,
-    Union, Iterator
+    Union, Iterator, overload
 )
 
 from kitty.boss import Boss
@@ -923,6 +923,17 @@ def open_tty(read_with_timeout: bool = False, optional_actions: int = termios.TC
     pass
 
 
+@overload
+def parse_input_from_terminal(
+    text_callback: Callable[[str], None], dcs_callback: Callable[[str], None],
+    csi_callback: Callable[[str], None], osc_callback: Callable[[str], None],
+    pm_callback: Callable[[str], None], apc_callback: Callable[[str], None],
+    data: Union[bytes, bytearray, memoryview], in_bracketed_paste: bool
+) -> bytes:
+    pass
+
+
+@overload
 def parse_input_from_terminal(
     text_callback: Callable[[str], None], dcs_callback: Callable[[str], None],
     csi_callback: Callable[[str], None], osc_callback: Callable[[str], None],
@@ -932,6 +943,10 @@ def parse_input_from_terminal(
     pass
 
 
+def parse_sgr_mouse_event(data: str) -> Tuple[int, int, int, bool]:
+    pass
+
+
 class Line:
 
     def sprite_at(self, cell: int) -> Tuple[int, int, int]:
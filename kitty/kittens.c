@@ -100,18 +100,51 @@ read_command_response(PyObject *self UNUSED, PyObject *args) {
     Py_RETURN_NONE;
 }
 
+static inline PyObject*
+call_with_one_arg(PyObject *callable, PyObject *arg) {
+    // avoid building an argument tuple per callback using vectorcall
+#if PY_VERSION_HEX >= 0x03090000
+    return PyObject_CallOneArg(callable, arg);
+#else
+    return _PyObject_Vectorcall(callable, &arg, 1, NULL);
+#endif
+}
+
+static inline PyObject*
+decode_utf8(const char *src, Py_ssize_t sz, bool has_non_ascii) {
+    // Terminal input is mostly ASCII, in which case we already know the
+    // result and can skip the UTF-8 validation. Single characters go via
+    // the decoder anyway as it returns a cached object for them.
+    if (has_non_ascii || sz < 2) return PyUnicode_DecodeUTF8(src, sz, "ignore");
+    PyObject *ans = PyUnicode_New(sz, 127);
+    if (ans) memcpy(PyUnicode_1BYTE_DATA(ans), src, sz);
+    return ans;
+}
+
 static PyObject*
 parse_input_from_terminal(PyObject *self UNUSED, PyObject *args) {
     enum State { NORMAL, ESC, CSI, ST, ESC_ST };
     enum State state = NORMAL;
-    PyObject *uo, *text_callback, *dcs_callback, *csi_callback, *osc_callback, *pm_callback, *apc_callback, *callback;
+    PyObject *uo, *text_callback, *dcs_callback, *csi_callback, *osc_callback, *pm_callback, *apc_callback, *callback, *ans = NULL;
     int inbp = 0;
-    if (!PyArg_ParseTuple(args, "OOOOOOUp", &text_callback, &dcs_callback, &csi_callback, &osc_callback, &pm_callback, &apc_callback, &uo, &inbp)) return NULL;
-    Py_ssize_t sz = PyUnicode_GET_LENGTH(uo), pos = 0, start = 0, count = 0, consumed = 0;
+    if (!PyArg_ParseTuple(args, "OOOOOOOp", &text_callback, &dcs_callback, &csi_callback, &osc_callback, &pm_callback, &apc_callback, &uo, &inbp)) return NULL;
+    // When passed a bytes-like object, the input is UTF-8 which is parsed
+    // as is, since all the escape code framing bytes are ASCII. Only the
+    // payloads passed to the callbacks are decoded.
+    const bool is_bytes = !PyUnicode_Check(uo);
+    Py_buffer buf = {0};
+    Py_ssize_t sz, pos = 0, start = 0, count = 0, consumed = 0;
+    int kind;
+    void *data;
+    if (is_bytes) {
+        if (PyObject_GetBuffer(uo, &buf, PyBUF_SIMPLE) != 0) return NULL;
+        sz = buf.len; kind = PyUnicode_1BYTE_KIND; data = buf.buf;
+    } else {
+        if (PyUnicode_READY(uo) != 0) return NULL;
+        sz = PyUnicode_GET_LENGTH(uo); kind = PyUnicode_KIND(uo); data = PyUnicode_DATA(uo);
+    }
     callback = text_callback;
-    int kind = PyUnicode_KIND(uo);
-    void *data = PyUnicode_DATA(uo);
-    bool in_bracketed_paste_mode = inbp != 0;
+    bool in_bracketed_paste_mode = inbp != 0, has_non_ascii = false;
 #define CALL(cb, s_, num_) {\
     PyObject *fcb = cb; \
     Py_ssize_t s = s_, num = num_; \
@@ -119,16 +152,23 @@ parse_input_from_terminal(PyObject *self UNUSED, PyObject *args) {
         fcb = text_callback; num += 2; s -= 2; \
     } \
     if (num > 0) { \
-        PyObject *ret = PyObject_CallFunction(fcb, "N", PyUnicode_Substring(uo, s, s + num));  \
-        if (ret == NULL) return NULL; \
-        Py_DECREF(ret); \
+        PyObject *payload = is_bytes ? decode_utf8((const char*)data + s, num, has_non_ascii) : PyUnicode_Substring(uo, s, s + num); \
+        if (payload == NULL) goto end; \
+        /* undecodeable bytes are dropped, which can leave nothing */ \
+        if (PyUnicode_GET_LENGTH(payload)) { \
+            PyObject *ret = call_with_one_arg(fcb, payload); \
+            Py_DECREF(payload); \
+            if (ret == NULL) goto end; \
+            Py_DECREF(ret); \
+        } else Py_DECREF(payload); \
     } \
     consumed = s_ + num_; \
-    count = 0; \
+    count = 0; has_non_ascii = false; \
 }
     START_ALLOW_CASE_RANGE;
     while (pos < sz) {
         Py_UCS4 ch = PyUnicode_READ(kind, data, pos);
+        if (ch > 127) has_non_ascii = true;
         switch(state) {
             case NORMAL:
                 if (ch == 0x1b) {
@@ -152,7 +192,8 @@ parse_input_from_terminal(PyObject *self UNUSED, PyObject *args) {
                     case '_':
                         state = ST; callback = apc_callback; break;
                     default:
-                        state = NORMAL; break;
+                        // the character after the ESC is text
+                        state = NORMAL; count = 1; break;
                 }
                 break;
             case CSI:
@@ -181,7 +222,8 @@ parse_input_from_terminal(PyObject *self UNUSED, PyObject *args) {
                     CALL(callback, start + 1, count);
                     state = NORMAL; start = pos + 1;
                     consumed += 2;
-                } else count += 2;
+                } else if (ch == 0x1b) count++;
+                else { count += 2; state = ST; }
                 break;
             case ST:
                 if (ch == 0x1b) { state = ESC_ST; }
@@ -190,14 +232,63 @@ parse_input_from_terminal(PyObject *self UNUSED, PyObject *args) {
         }
         pos++;
     }
-    if (state == NORMAL && count > 0) CALL(text_callback, start, count);
-    return PyUnicode_Substring(uo, consumed, sz);
+    if (state == NORMAL && count > 0) {
+        if (is_bytes) {
+            // leave a trailing incomplete UTF-8 sequence for the next call
+            const uint8_t *b = data;
+            const Py_ssize_t text_end = start + count;
+            Py_ssize_t lead = text_end - 1;
+            while (lead > start && text_end - lead < 4 && (b[lead] & 0xc0) == 0x80) lead--;
+            Py_ssize_t needed = (b[lead] & 0xe0) == 0xc0 ? 2 : ((b[lead] & 0xf0) == 0xe0 ? 3 : ((b[lead] & 0xf8) == 0xf0 ? 4 : 1));
+            if (text_end - lead < needed) count -= text_end - lead;
+        }
+        CALL(text_callback, start, count);
+    }
+    ans = is_bytes ? PyBytes_FromStringAndSize((const char*)data + consumed, sz - consumed) : PyUnicode_Substring(uo, consumed, sz);
+end:
+    if (is_bytes) PyBuffer_Release(&buf);
+    return ans;
     END_ALLOW_CASE_RANGE;
 #undef CALL
 }
 
+static PyObject*
+parse_sgr_mouse_event(PyObject *self UNUSED, PyObject *args) {
+    PyObject *uo;
+    if (!PyArg_ParseTuple(args, "U", &uo)) return NULL;
+    Py_ssize_t sz = PyUnicode_GET_LENGTH(uo);
+    int kind = PyUnicode_KIND(uo);
+    void *data = PyUnicode_DATA(uo);
+    long nums[3] = {0};
+    bool negative[3] = {0};
+    unsigned int which = 0, digits = 0;
+    if (sz < 6) goto invalid;
+    Py_UCS4 last = PyUnicode_READ(kind, data, sz - 1);
+    if (last != 'm' && last != 'M') goto invalid;
+    for (Py_ssize_t i = 0; i < sz - 1; i++) {
+        Py_UCS4 ch = PyUnicode_READ(kind, data, i);
+        if (ch == ';') {
+            if (!digits || ++which > 2) goto invalid;
+            digits = 0;
+        } else if ('0' <= ch && ch <= '9') {
+            if (++digits > 9) goto invalid;
+            nums[which] = nums[which] * 10 + (ch - '0');
+        } else if (ch == '-' && which && !digits && !negative[which]) {
+            // pixel co-ordinates are negative when dragging outside the window
+            negative[which] = true;
+        } else goto invalid;
+    }
+    if (which != 2 || !digits) goto invalid;
+    for (unsigned int i = 1; i < 3; i++) if (negative[i]) nums[i] = -nums[i];
+    return Py_BuildValue("lllO", nums[0], nums[1], nums[2], last == 'm' ? Py_True : Py_False);
+invalid:
+    PyErr_SetString(PyExc_ValueError, "Invalid SGR mouse event");
+    return NULL;
+}
+
 static PyMethodDef module_methods[] = {
     METHODB(parse_input_from_terminal, METH_VARARGS),
+    METHODB(parse_sgr_mouse_event, METH_VARARGS),
     METHODB(read_command_response, METH_VARARGS),
     {NULL, NULL, 0, NULL}        /* Sentinel */
 };
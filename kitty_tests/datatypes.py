@@ -402,25 +402,27 @@ def w(x):
         self.ae(tpl('a\x1b[31mbc', 2), 7)
 
         def tp(*data, leftover='', text='', csi='', apc='', ibp=False):
-            text_r, csi_r, apc_r, rest = [], [], [], []
-            left = ''
-            in_bp = ibp
-
-            def on_csi(x):
-                nonlocal in_bp
-                if x == '200~':
-                    in_bp = True
-                elif x == '201~':
-                    in_bp = False
-                csi_r.append(x)
-
-            for d in data:
-                left = parse_input_from_terminal(text_r.append, rest.append, on_csi, rest.append, rest.append, apc_r.append, left + d, in_bp)
-            self.ae(left, leftover)
-            self.ae(text, ' '.join(text_r))
-            self.ae(csi, ' '.join(csi_r))
-            self.ae(apc, ' '.join(apc_r))
-            self.assertFalse(rest)
+            for as_bytes in (False, True):
+                text_r, csi_r, apc_r, rest = [], [], [], []
+                left = b'' if as_bytes else ''
+                in_bp = ibp
+
+                def on_csi(x):
+                    nonlocal in_bp
+                    if x == '200~':
+                        in_bp = True
+                    elif x == '201~':
+                        in_bp = False
+                    csi_r.append(x)
+
+                for d in data:
+                    left = parse_input_from_terminal(
+                        text_r.append, rest.append, on_csi, rest.append, rest.append, apc_r.append, left + (d.encode() if as_bytes else d), in_bp)
+                self.ae(left.decode() if as_bytes else left, leftover)
+                self.ae(text, ' '.join(text_r))
+                self.ae(csi, ' '.join(csi_r))
+                self.ae(apc, ' '.join(apc_r))
+                self.assertFalse(rest)
 
         tp('a\033[200~\033[32mxy\033[201~\033[33ma', text='a \033[32m xy a', csi='200~ 201~ 33m')
         tp('abc', text='abc')
@@ -430,6 +432,17 @@ def on_csi(x):
         tp('a\033[', 'mb', text='a b', csi='m')
         tp('a\033', '_', 'x\033', '\\b', text='a b', apc='x')
         tp('a\033_', 'x', '\033', '\\', 'b', text='a b', apc='x')
+        tp('a\xe9\033[mb\U0001f337', text='a\xe9 b\U0001f337', csi='m')
+        tp('a\033bc', text='a bc')
+        tp('\033\xe9', text='\xe9')
+        tp('a\033_x\033yz\033\033\\b', text='a b', apc='x\033yz\033')
+
+        text_r = []
+        left = b''
+        for d in (b'a\xf0\x9f', b'\x8c', b'\xb7b\xc3', b'\xa9'):
+            left = parse_input_from_terminal(text_r.append, text_r.append, text_r.append, text_r.append, text_r.append, text_r.append, left + d, False)
+        self.ae(left, b'')
+        self.ae(text_r, ['a', '\U0001f337b', '\xe9'])
 
         for prefix in ('/tmp', tempfile.gettempdir()):
             for path in ('a.png', 'x/b.jpg', 'y/../c.jpg'):
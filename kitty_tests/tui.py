@@ -45,3 +45,100 @@ def test_line_edit(self):
     def test_multiprocessing_spawn(self):
         from kitty.multiprocessing import test_spawn
         test_spawn()
+
+    def test_decode_sgr_mouse(self):
+        from kittens.tui.loop import EventType, MouseButton, decode_sgr_mouse
+        from kitty.key_encoding import CTRL
+        from kitty.utils import ScreenSize
+        ss = ScreenSize(10, 10, 100, 200, 10, 20)
+        ev = decode_sgr_mouse('0;15;45M', ss)
+        self.ae((ev.cell_x, ev.cell_y, ev.pixel_x, ev.pixel_y), (1, 2, 15, 45))
+        self.ae((ev.type, ev.buttons, ev.mods), (EventType.PRESS, MouseButton.LEFT, 0))
+        ev = decode_sgr_mouse('18;1;2m', ss)
+        self.ae((ev.type, ev.buttons, ev.mods), (EventType.RELEASE, MouseButton.RIGHT, CTRL))
+        ev = decode_sgr_mouse('35;1;2M', ss)
+        self.ae((ev.type, ev.buttons), (EventType.MOVE, MouseButton.NONE))
+        ev = decode_sgr_mouse('65;1;2M', ss)
+        self.ae(ev.buttons, MouseButton.WHEEL_DOWN)
+        ev = decode_sgr_mouse('32;-5;-10M', ss)
+        self.ae((ev.cell_x, ev.cell_y, ev.pixel_x, ev.pixel_y), (0, 0, -5, -10))
+        self.ae((ev.type, ev.buttons), (EventType.MOVE, MouseButton.LEFT))
+        for bad in ('0;1M', '0;1;2', 'a;1;2M', '1;;2M', '1;2;3;4M', '-1;2;3M', '1;--2;3M', '1;-;3M', '1;2-;3M'):
+            self.assertRaises(ValueError, decode_sgr_mouse, bad, ss)
+
+    def test_loop_on_text(self):
+        from kittens.tui.loop import Loop
+        from kitty.key_encoding import backspace_key, enter_key
+
+        class Recorder:
+
+            def __init__(self):
+                self.events = []
+
+            def on_text(self, text, in_bracketed_paste):
+                self.events.append((text, in_bracketed_paste))
+
+            def on_key(self, key_event):
+                self.events.append(key_event)
+
+            def on_interrupt(self):
+                self.events.append('interrupt')
+
+            def on_eot(self):
+                self.events.append('eot')
+
+        def t(text, *expected, loop=None):
+            loop = loop or Loop()
+            loop.handler = Recorder()
+            loop._on_text(text)
+            self.ae(loop.handler.events, list(expected))
+
+        t('abc', ('abc', False))
+        t('ab\rcd', ('ab', False), enter_key, ('cd', False))
+        t('\r\177\x03\x04', enter_key, backspace_key, 'interrupt', 'eot')
+        t('\rab\177', enter_key, ('ab', False), backspace_key)
+        t('a\x04b\x03\x03c', ('a', False), 'eot', ('b', False), 'interrupt', 'interrupt', ('c', False))
+        t('')
+        t('a', ('a', False))
+        t('\r', enter_key)
+        t('\177', backspace_key)
+        t('\x03', 'interrupt')
+        t('\x04', 'eot')
+
+        loop = Loop()
+        loop._on_csi('200~')
+        t('x', ('x', True), loop=loop)
+        t('\r', loop=loop)
+        t('\x03', loop=loop)
+        t('a\x07b\rc\x9bd\x03', ('abcd', True), loop=loop)
+        t('\x04\x7f', loop=loop)
+        loop._on_csi('201~')
+        t('a\rb', ('a', False), enter_key, ('b', False), loop=loop)
+
+        loop = Loop(sanitize_bracketed_paste='')
+        loop._on_csi('200~')
+        t('a\rb\x07', ('a', True), enter_key, ('b\x07', True), loop=loop)
+
+    def test_loop_capability_response(self):
+        from kittens.tui.loop import Loop
+
+        class Recorder:
+
+            def __init__(self):
+                self.responses = []
+
+            def on_capability_response(self, name, val):
+                self.responses.append((name, val))
+
+        def t(dcs, *expected):
+            loop = Loop()
+            loop.handler = Recorder()
+            loop._on_dcs(dcs)
+            self.ae(loop.handler.responses, list(expected))
+
+        t('1+rTN=787465726d2d6b69747479', ('TN', 'xterm-kitty'))
+        t('1+rTN=787465726d;Co=323536', ('TN', 'xterm'), ('Co', '256'))
+        t('1+rbad;Co=323536;odd=123;hex=xyz', ('Co', '256'))
+        t('1+r;Co=323536;;e=;', ('Co', '256'), ('e', ''))
+        t('1+r=41;k=v=w', ('', 'A'))
+        t('1+r')